@@ -1,144 +1,146 @@
 from typing import Any, Dict, List, Optional
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from ..integrations.calendar import GoogleCalendarClient
 
 logger = logging.getLogger(__name__)
 
-
-class CalendarTools:
-    def __init__(self, calendar_client: Optional[GoogleCalendarClient] = None):
-        self.calendar_client = calendar_client or GoogleCalendarClient()
-
-    def get_function_definitions(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "name": "list_calendar_events",
-                "description": "List upcoming calendar events",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "max_results": {
-                            "type": "integer",
-                            "description": "Maximum number of events to return",
-                            "default": 10,
-                        },
-                        "time_min": {
-                            "type": "string",
-                            "description": "Start date-time (ISO 8601 format)",
-                        },
-                        "time_max": {
-                            "type": "string",
-                            "description": "End date-time (ISO 8601 format)",
-                        },
-                    },
+FUNCTION_DEFINITIONS: List[Dict[str, Any]] = [
+    {
+        "name": "list_calendar_events",
+        "description": "List upcoming calendar events",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of events to return",
+                    "default": 10,
+                },
+                "time_min": {
+                    "type": "string",
+                    "description": "Start date-time (ISO 8601 format)",
+                },
+                "time_max": {
+                    "type": "string",
+                    "description": "End date-time (ISO 8601 format)",
                 },
             },
-            {
-                "name": "search_calendar_events",
-                "description": "Search calendar events by query",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Search query",
-                        },
-                        "max_results": {
-                            "type": "integer",
-                            "description": "Maximum number of results",
-                            "default": 10,
-                        },
-                    },
-                    "required": ["query"],
+        },
+    },
+    {
+        "name": "search_calendar_events",
+        "description": "Search calendar events by query",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query",
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of results",
+                    "default": 10,
                 },
             },
-            {
-                "name": "create_calendar_event",
-                "description": "Create a new calendar event",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "summary": {
-                            "type": "string",
-                            "description": "Event title/summary",
-                        },
-                        "start_time": {
-                            "type": "string",
-                            "description": "Start date-time (ISO 8601 format)",
-                        },
-                        "end_time": {
-                            "type": "string",
-                            "description": "End date-time (ISO 8601 format)",
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Event description",
-                        },
-                        "location": {
-                            "type": "string",
-                            "description": "Event location",
-                        },
-                        "attendees": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Attendee email addresses",
-                        },
-                    },
-                    "required": ["summary", "start_time", "end_time"],
+            "required": ["query"],
+        },
+    },
+    {
+        "name": "create_calendar_event",
+        "description": "Create a new calendar event",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "summary": {
+                    "type": "string",
+                    "description": "Event title/summary",
+                },
+                "start_time": {
+                    "type": "string",
+                    "description": "Start date-time (ISO 8601 format)",
+                },
+                "end_time": {
+                    "type": "string",
+                    "description": "End date-time (ISO 8601 format)",
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Event description",
+                },
+                "location": {
+                    "type": "string",
+                    "description": "Event location",
+                },
+                "attendees": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Attendee email addresses",
                 },
             },
-            {
-                "name": "update_calendar_event",
-                "description": "Update an existing calendar event",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "event_id": {
-                            "type": "string",
-                            "description": "Event ID",
-                        },
-                        "summary": {
-                            "type": "string",
-                            "description": "New event title",
-                        },
-                        "start_time": {
-                            "type": "string",
-                            "description": "New start time (ISO 8601)",
-                        },
-                        "end_time": {
-                            "type": "string",
-                            "description": "New end time (ISO 8601)",
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "New description",
-                        },
-                        "location": {
-                            "type": "string",
-                            "description": "New location",
-                        },
-                    },
-                    "required": ["event_id"],
+            "required": ["summary", "start_time", "end_time"],
+        },
+    },
+    {
+        "name": "update_calendar_event",
+        "description": "Update an existing calendar event",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "event_id": {
+                    "type": "string",
+                    "description": "Event ID",
+                },
+                "summary": {
+                    "type": "string",
+                    "description": "New event title",
+                },
+                "start_time": {
+                    "type": "string",
+                    "description": "New start time (ISO 8601)",
+                },
+                "end_time": {
+                    "type": "string",
+                    "description": "New end time (ISO 8601)",
+                },
+                "description": {
+                    "type": "string",
+                    "description": "New description",
+                },
+                "location": {
+                    "type": "string",
+                    "description": "New location",
                 },
             },
-            {
-                "name": "delete_calendar_event",
-                "description": "Delete a calendar event",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "event_id": {
-                            "type": "string",
-                            "description": "Event ID to delete",
-                        },
-                    },
-                    "required": ["event_id"],
+            "required": ["event_id"],
+        },
+    },
+    {
+        "name": "delete_calendar_event",
+        "description": "Delete a calendar event",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "event_id": {
+                    "type": "string",
+                    "description": "Event ID to delete",
                 },
             },
-        ]
+            "required": ["event_id"],
+        },
+    },
+]
+
+
+class CalendarTools:
+    def __init__(self, calendar_client: Optional[GoogleCalendarClient] = None):
+        self.calendar_client = calendar_client or GoogleCalendarClient()
+
+    def get_function_definitions(self) -> List[Dict[str, Any]]:
+        return FUNCTION_DEFINITIONS
 
     async def execute_function(
         self, function_name: str, arguments: Dict[str, Any]
@@ -157,7 +159,7 @@ class CalendarTools:
             else:
                 return json.dumps({"error": f"Unknown function: {function_name}"})
         except Exception as e:
-            logger.error(f"Error executing {function_name}: {e}", exc_info=True)
+            logger.error("Error executing %s: %s", function_name, e, exc_info=True)
             return json.dumps({"error": str(e)})
 
     async def _list_events(
@@ -166,6 +168,11 @@ class CalendarTools:
         time_min: Optional[str] = None,
         time_max: Optional[str] = None,
     ) -> str:
+        if not time_min:
+            # Truncated to the minute so repeated calls share a cache entry
+            now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            time_min = now.isoformat()
+
         events = await self.calendar_client.list_events(
             max_results=max_results, time_min=time_min, time_max=time_max
         )
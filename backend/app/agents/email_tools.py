@@ -7,106 +7,123 @@ from ..integrations.gmail import GmailClient
 
 logger = logging.getLogger(__name__)
 
-
-class EmailTools:
-    def __init__(self, gmail_client: Optional[GmailClient] = None):
-        self.gmail_client = gmail_client or GmailClient()
-
-    def get_function_definitions(self) -> List[Dict[str, Any]]:
-        return [
-            {
-                "name": "list_emails",
-                "description": "List recent emails from inbox",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "max_results": {
-                            "type": "integer",
-                            "description": "Maximum number of emails to return",
-                            "default": 10,
-                        },
-                        "query": {
-                            "type": "string",
-                            "description": "Search query (e.g., 'from:user@example.com', 'subject:meeting')",
-                        },
-                    },
+FUNCTION_DEFINITIONS: List[Dict[str, Any]] = [
+    {
+        "name": "list_emails",
+        "description": "List recent emails from inbox",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of emails to return",
+                    "default": 10,
+                },
+                "query": {
+                    "type": "string",
+                    "description": "Search query (e.g., 'from:user@example.com', 'subject:meeting')",
                 },
             },
-            {
-                "name": "search_emails",
-                "description": "Search emails by query (supports from:, to:, subject:, after:, before:)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Search query",
-                        },
-                        "max_results": {
-                            "type": "integer",
-                            "description": "Maximum number of results",
-                            "default": 10,
-                        },
-                    },
-                    "required": ["query"],
+        },
+    },
+    {
+        "name": "search_emails",
+        "description": "Search emails by query (supports from:, to:, subject:, after:, before:)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query",
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of results",
+                    "default": 10,
+                },
+            },
+            "required": ["query"],
+        },
+    },
+    {
+        "name": "get_unread_emails",
+        "description": "Get unread emails from inbox",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "max_results": {
+                    "type": "integer",
+                    "description": "Maximum number of emails to return",
+                    "default": 10,
                 },
             },
-            {
-                "name": "get_unread_emails",
-                "description": "Get unread emails from inbox",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "max_results": {
-                            "type": "integer",
-                            "description": "Maximum number of emails to return",
-                            "default": 10,
-                        },
-                    },
+        },
+    },
+    {
+        "name": "send_email",
+        "description": "Send an email",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "to": {
+                    "type": "string",
+                    "description": "Recipient email address",
+                },
+                "subject": {
+                    "type": "string",
+                    "description": "Email subject",
+                },
+                "body": {
+                    "type": "string",
+                    "description": "Email body content",
+                },
+                "cc": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "CC recipients",
                 },
             },
-            {
-                "name": "send_email",
-                "description": "Send an email",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "to": {
-                            "type": "string",
-                            "description": "Recipient email address",
-                        },
-                        "subject": {
-                            "type": "string",
-                            "description": "Email subject",
-                        },
-                        "body": {
-                            "type": "string",
-                            "description": "Email body content",
-                        },
-                        "cc": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "CC recipients",
-                        },
-                    },
-                    "required": ["to", "subject", "body"],
+            "required": ["to", "subject", "body"],
+        },
+    },
+    {
+        "name": "mark_email_as_read",
+        "description": "Mark an email as read",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "message_id": {
+                    "type": "string",
+                    "description": "Email message ID",
                 },
             },
-            {
-                "name": "mark_email_as_read",
-                "description": "Mark an email as read",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "message_id": {
-                            "type": "string",
-                            "description": "Email message ID",
-                        },
-                    },
-                    "required": ["message_id"],
+            "required": ["message_id"],
+        },
+    },
+    {
+        "name": "mark_emails_as_read",
+        "description": "Mark several emails as read in a single request",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "message_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Email message IDs",
                 },
             },
-        ]
+            "required": ["message_ids"],
+        },
+    },
+]
+
+
+class EmailTools:
+    def __init__(self, gmail_client: Optional[GmailClient] = None):
+        self.gmail_client = gmail_client or GmailClient()
+
+    def get_function_definitions(self) -> List[Dict[str, Any]]:
+        return FUNCTION_DEFINITIONS
 
     async def execute_function(
         self, function_name: str, arguments: Dict[str, Any]
@@ -122,10 +139,12 @@ class EmailTools:
                 return await self._send_email(**arguments)
             elif function_name == "mark_email_as_read":
                 return await self._mark_email_as_read(**arguments)
+            elif function_name == "mark_emails_as_read":
+                return await self._mark_emails_as_read(**arguments)
             else:
                 return json.dumps({"error": f"Unknown function: {function_name}"})
         except Exception as e:
-            logger.error(f"Error executing {function_name}: {e}", exc_info=True)
+            logger.error("Error executing %s: %s", function_name, e, exc_info=True)
             return json.dumps({"error": str(e)})
 
     async def _list_emails(
@@ -222,5 +241,16 @@ class EmailTools:
 
         return json.dumps(result, ensure_ascii=False)
 
+    async def _mark_emails_as_read(self, message_ids: List[str]) -> str:
+        await self.gmail_client.bulk_mark_as_read(message_ids)
+
+        result = {
+            "status": "success",
+            "count": len(message_ids),
+            "message_ids": message_ids,
+        }
+
+        return json.dumps(result, ensure_ascii=False)
+
     async def close(self):
         await self.gmail_client.close()
@@ -1,38 +1,79 @@
 import os
-from typing import Optional, List, Dict, Any
-from pathlib import Path
+from typing import Optional, List, Dict, Any, AsyncIterator
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
 import httpx
 from pydantic import BaseModel
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+
+from .http_client import (
+    RESPONSE_CACHE,
+    cached,
+    get_shared_client,
+    get_token_auth,
+    json_dumps,
+    read_json,
+    send_authorized,
+)
+
+_EVENT_LIST_FIELDS = (
+    "items(id,summary,description,start,end,location,attendees(email),status,"
+    "htmlLink),nextPageToken"
+)
+
+
+def _to_rfc3339(value: str) -> str:
+    # The API rejects timestamps without an offset; treat naive ones as UTC
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _invalidate_events():
+    for key in [key for key in RESPONSE_CACHE if key[0] == "events"]:
+        RESPONSE_CACHE.pop(key, None)
 
 
 class CalendarConfig(BaseModel):
     credentials_path: Optional[str] = None
     token_path: Optional[str] = None
+    cache_ttl: float = 30
 
 
-class CalendarEvent(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class CalendarEvent:
     id: str
     summary: str
     description: Optional[str] = None
     start_time: str
     end_time: str
     location: Optional[str] = None
-    attendees: List[str] = []
+    attendees: List[str] = field(default_factory=list)
     status: str
     html_link: str
 
 
 class GoogleCalendarClient:
     API_ENDPOINT = "https://www.googleapis.com/calendar/v3"
+    _CALENDARS_URL = API_ENDPOINT + "/calendars/"
     SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
-    def __init__(self, config: Optional[CalendarConfig] = None):
+    def __init__(
+        self,
+        config: Optional[CalendarConfig] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         self.config = config or self._load_config_from_env()
-        self.credentials = None
-        self.client = httpx.AsyncClient()
-        self._load_credentials()
+        self.client = client
+        self.auth = get_token_auth(self.config.token_path)
+
+    async def _ensure_client(self):
+        if self.client is None:
+            self.client = await get_shared_client()
 
     def _load_config_from_env(self) -> CalendarConfig:
         return CalendarConfig(
@@ -40,28 +81,9 @@ class GoogleCalendarClient:
             token_path=os.getenv("GOOGLE_TOKEN_PATH", "token.json"),
         )
 
-    def _load_credentials(self):
-        token_path = Path(self.config.token_path)
-
-        if token_path.exists():
-            self.credentials = Credentials.from_authorized_user_file(
-                str(token_path), self.SCOPES
-            )
-
-        if (
-            self.credentials
-            and self.credentials.expired
-            and self.credentials.refresh_token
-        ):
-            self.credentials.refresh(Request())
-            with open(token_path, "w") as token:
-                token.write(self.credentials.to_json())
-
-    def _get_headers(self) -> Dict[str, str]:
-        headers = {"Accept": "application/json"}
-        if self.credentials and self.credentials.token:
-            headers["Authorization"] = f"Bearer {self.credentials.token}"
-        return headers
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        await self._ensure_client()
+        return await send_authorized(self.client, self.auth, method, url, **kwargs)
 
     async def list_events(
         self,
@@ -71,58 +93,102 @@ class GoogleCalendarClient:
         max_results: int = 10,
         query: Optional[str] = None,
     ) -> List[CalendarEvent]:
-        url = f"{self.API_ENDPOINT}/calendars/{calendar_id}/events"
+        return await cached(
+            ("events", calendar_id, time_min, time_max, max_results, query),
+            self.config.cache_ttl,
+            lambda: self._fetch_events(
+                calendar_id, time_min, time_max, max_results, query
+            ),
+        )
+
+    async def _fetch_events(
+        self,
+        calendar_id: str,
+        time_min: Optional[str],
+        time_max: Optional[str],
+        max_results: int,
+        query: Optional[str],
+    ) -> List[CalendarEvent]:
+        url = self._CALENDARS_URL + calendar_id + "/events"
+        params = self._event_params(time_min, time_max, query, max_results)
+
+        response = await self._request("GET", url, params=params)
+
+        data = read_json(response)
+        return [self._parse_event(item) for item in data.get("items", ())]
+
+    async def iter_events(
+        self,
+        calendar_id: str = "primary",
+        time_min: Optional[str] = None,
+        time_max: Optional[str] = None,
+        query: Optional[str] = None,
+        page_size: int = 50,
+    ) -> AsyncIterator[CalendarEvent]:
+        url = self._CALENDARS_URL + calendar_id + "/events"
+        params = self._event_params(time_min, time_max, query, page_size)
+
+        while True:
+            response = await self._request("GET", url, params=params)
+            data = read_json(response)
+
+            for item in data.get("items", ()):
+                yield self._parse_event(item)
+
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                break
+            params["pageToken"] = page_token
+
+    def _event_params(
+        self,
+        time_min: Optional[str],
+        time_max: Optional[str],
+        query: Optional[str],
+        max_results: int,
+    ) -> Dict[str, Any]:
         params = {
             "maxResults": max_results,
             "singleEvents": True,
             "orderBy": "startTime",
+            "fields": _EVENT_LIST_FIELDS,
         }
 
         if time_min:
-            params["timeMin"] = time_min
+            params["timeMin"] = _to_rfc3339(time_min)
         if time_max:
-            params["timeMax"] = time_max
+            params["timeMax"] = _to_rfc3339(time_max)
         if query:
             params["q"] = query
 
-        response = await self.client.get(
-            url, headers=self._get_headers(), params=params
+        return params
+
+    def _parse_event(self, item: Dict[str, Any]) -> CalendarEvent:
+        start = item.get("start", {})
+        end = item.get("end", {})
+
+        return CalendarEvent(
+            id=item["id"],
+            summary=item.get("summary", "No Title"),
+            description=item.get("description"),
+            start_time=start.get("dateTime") or start.get("date", ""),
+            end_time=end.get("dateTime") or end.get("date", ""),
+            location=item.get("location"),
+            attendees=[
+                email
+                for attendee in item.get("attendees", ())
+                if (email := attendee.get("email"))
+            ],
+            status=item.get("status", "confirmed"),
+            html_link=item.get("htmlLink", ""),
         )
-        response.raise_for_status()
-
-        data = response.json()
-        events = []
-
-        for item in data.get("items", []):
-            start = item.get("start", {})
-            end = item.get("end", {})
-
-            events.append(
-                CalendarEvent(
-                    id=item["id"],
-                    summary=item.get("summary", "No Title"),
-                    description=item.get("description"),
-                    start_time=start.get("dateTime", start.get("date", "")),
-                    end_time=end.get("dateTime", end.get("date", "")),
-                    location=item.get("location"),
-                    attendees=[
-                        attendee.get("email", "")
-                        for attendee in item.get("attendees", [])
-                    ],
-                    status=item.get("status", "confirmed"),
-                    html_link=item.get("htmlLink", ""),
-                )
-            )
-
-        return events
 
     async def get_event(
         self, event_id: str, calendar_id: str = "primary"
     ) -> Dict[str, Any]:
-        url = f"{self.API_ENDPOINT}/calendars/{calendar_id}/events/{event_id}"
-        response = await self.client.get(url, headers=self._get_headers())
-        response.raise_for_status()
-        return response.json()
+        url = self._CALENDARS_URL + calendar_id + "/events/" + event_id
+        response = await self._request("GET", url)
+        return read_json(response)
 
     async def create_event(
         self,
@@ -134,7 +200,7 @@ class GoogleCalendarClient:
         attendees: Optional[List[str]] = None,
         calendar_id: str = "primary",
     ) -> Dict[str, Any]:
-        url = f"{self.API_ENDPOINT}/calendars/{calendar_id}/events"
+        url = self._CALENDARS_URL + calendar_id + "/events"
 
         event_data = {
             "summary": summary,
@@ -149,12 +215,10 @@ class GoogleCalendarClient:
         if attendees:
             event_data["attendees"] = [{"email": email} for email in attendees]
 
-        response = await self.client.post(
-            url, headers=self._get_headers(), json=event_data
-        )
-        response.raise_for_status()
+        response = await self._request("POST", url, content=json_dumps(event_data))
+        _invalidate_events()
 
-        return response.json()
+        return read_json(response)
 
     async def update_event(
         self,
@@ -166,7 +230,7 @@ class GoogleCalendarClient:
         location: Optional[str] = None,
         calendar_id: str = "primary",
     ) -> Dict[str, Any]:
-        url = f"{self.API_ENDPOINT}/calendars/{calendar_id}/events/{event_id}"
+        url = self._CALENDARS_URL + calendar_id + "/events/" + event_id
 
         event_data = {}
         if summary:
@@ -180,17 +244,15 @@ class GoogleCalendarClient:
         if location is not None:
             event_data["location"] = location
 
-        response = await self.client.patch(
-            url, headers=self._get_headers(), json=event_data
-        )
-        response.raise_for_status()
+        response = await self._request("PATCH", url, content=json_dumps(event_data))
+        _invalidate_events()
 
-        return response.json()
+        return read_json(response)
 
     async def delete_event(self, event_id: str, calendar_id: str = "primary") -> None:
-        url = f"{self.API_ENDPOINT}/calendars/{calendar_id}/events/{event_id}"
-        response = await self.client.delete(url, headers=self._get_headers())
-        response.raise_for_status()
+        url = self._CALENDARS_URL + calendar_id + "/events/" + event_id
+        await self._request("DELETE", url)
+        _invalidate_events()
 
     async def search_events(
         self,
@@ -203,4 +265,5 @@ class GoogleCalendarClient:
         )
 
     async def close(self):
-        await self.client.aclose()
+        # The HTTP client is shared process-wide and closed on app shutdown
+        self.client = None
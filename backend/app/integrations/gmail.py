@@ -1,19 +1,38 @@
 import os
 import base64
-from typing import Optional, List, Dict, Any
-from pathlib import Path
+import asyncio
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+from dataclasses import dataclass, field
 import httpx
 from pydantic import BaseModel
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+
+from .http_client import (
+    RESPONSE_CACHE,
+    cached,
+    get_shared_client,
+    get_token_auth,
+    json_dumps,
+    read_json,
+    send_authorized,
+)
+
+DEFAULT_CONCURRENCY = 16
+
+_LIST_FIELDS = "messages(id),nextPageToken"
+_HISTORY_FIELDS = "history(messagesAdded(message(id))),historyId,nextPageToken"
+_MESSAGE_FIELDS = (
+    "id,threadId,snippet,labelIds,payload(headers,body/data,parts(mimeType,body/data))"
+)
 
 
 class GmailConfig(BaseModel):
     credentials_path: Optional[str] = None
     token_path: Optional[str] = None
+    cache_ttl: float = 30
 
 
-class Email(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Email:
     id: str
     thread_id: str
     subject: str
@@ -23,18 +42,32 @@ class Email(BaseModel):
     body: Optional[str] = None
     date: str
     is_unread: bool
-    labels: List[str] = []
+    labels: List[str] = field(default_factory=list)
 
 
 class GmailClient:
     API_ENDPOINT = "https://gmail.googleapis.com/gmail/v1"
+    _MESSAGES_URL = API_ENDPOINT + "/users/me/messages"
+    _MESSAGE_URL = _MESSAGES_URL + "/"
+    _SEND_URL = _MESSAGES_URL + "/send"
+    _BATCH_MODIFY_URL = _MESSAGES_URL + "/batchModify"
+    _HISTORY_URL = API_ENDPOINT + "/users/me/history"
+    _PROFILE_URL = API_ENDPOINT + "/users/me/profile"
     SCOPES = ["https://www.googleapis.com/auth/gmail.modify"]
+    BATCH_MODIFY_LIMIT = 1000
 
-    def __init__(self, config: Optional[GmailConfig] = None):
+    def __init__(
+        self,
+        config: Optional[GmailConfig] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         self.config = config or self._load_config_from_env()
-        self.credentials = None
-        self.client = httpx.AsyncClient()
-        self._load_credentials()
+        self.client = client
+        self.auth = get_token_auth(self.config.token_path)
+
+    async def _ensure_client(self):
+        if self.client is None:
+            self.client = await get_shared_client()
 
     def _load_config_from_env(self) -> GmailConfig:
         return GmailConfig(
@@ -42,28 +75,9 @@ class GmailClient:
             token_path=os.getenv("GOOGLE_TOKEN_PATH", "token.json"),
         )
 
-    def _load_credentials(self):
-        token_path = Path(self.config.token_path)
-
-        if token_path.exists():
-            self.credentials = Credentials.from_authorized_user_file(
-                str(token_path), self.SCOPES
-            )
-
-        if (
-            self.credentials
-            and self.credentials.expired
-            and self.credentials.refresh_token
-        ):
-            self.credentials.refresh(Request())
-            with open(token_path, "w") as token:
-                token.write(self.credentials.to_json())
-
-    def _get_headers(self) -> Dict[str, str]:
-        headers = {"Accept": "application/json"}
-        if self.credentials and self.credentials.token:
-            headers["Authorization"] = f"Bearer {self.credentials.token}"
-        return headers
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        await self._ensure_client()
+        return await send_authorized(self.client, self.auth, method, url, **kwargs)
 
     async def list_messages(
         self,
@@ -71,45 +85,114 @@ class GmailClient:
         max_results: int = 10,
         label_ids: Optional[List[str]] = None,
     ) -> List[Email]:
-        url = f"{self.API_ENDPOINT}/users/me/messages"
-        params = {"maxResults": max_results}
+        url = self._MESSAGES_URL
+        params = self._list_params(query, label_ids, max_results)
+
+        response = await self._request("GET", url, params=params)
+
+        messages_data = read_json(response)
+        message_ids = [msg["id"] for msg in messages_data.get("messages", ())]
+
+        return await self.get_messages(message_ids)
+
+    async def iter_messages(
+        self,
+        query: Optional[str] = None,
+        label_ids: Optional[List[str]] = None,
+        page_size: int = 50,
+    ) -> AsyncIterator[Email]:
+        url = self._MESSAGES_URL
+        params = self._list_params(query, label_ids, page_size)
+
+        while True:
+            response = await self._request("GET", url, params=params)
+            messages_data = read_json(response)
+            message_ids = [msg["id"] for msg in messages_data.get("messages", ())]
+
+            for message in await self.get_messages(message_ids):
+                yield message
+
+            page_token = messages_data.get("nextPageToken")
+            if not page_token:
+                break
+            params["pageToken"] = page_token
+
+    async def get_mail_delta(
+        self, history_id: Optional[str] = None
+    ) -> Tuple[List[Email], str]:
+        if history_id is None:
+            url = self._PROFILE_URL
+            response = await self._request("GET", url, params={"fields": "historyId"})
+            return [], read_json(response)["historyId"]
+
+        url = self._HISTORY_URL
+        params = {
+            "startHistoryId": history_id,
+            "historyTypes": "messageAdded",
+            "labelId": "INBOX",
+            "fields": _HISTORY_FIELDS,
+        }
+        message_ids: Dict[str, None] = {}
+
+        while True:
+            try:
+                response = await self._request("GET", url, params=params)
+            except httpx.HTTPStatusError as e:
+                # The start id is too old to diff against; hand back a fresh one
+                if e.response.status_code == 404:
+                    return await self.get_mail_delta()
+                raise
+
+            history_data = read_json(response)
+            for record in history_data.get("history", ()):
+                for added in record.get("messagesAdded", ()):
+                    message_ids[added["message"]["id"]] = None
+
+            page_token = history_data.get("nextPageToken")
+            if not page_token:
+                break
+            params["pageToken"] = page_token
+
+        # Messages deleted since they were added are gone; the rest of the diff
+        # and the new history id still stand
+        emails = await self.get_messages(list(message_ids), skip_missing=True)
+        return emails, history_data.get("historyId", history_id)
+
+    def _list_params(
+        self,
+        query: Optional[str],
+        label_ids: Optional[List[str]],
+        max_results: int,
+    ) -> Dict[str, Any]:
+        params = {"maxResults": max_results, "fields": _LIST_FIELDS}
 
         if query:
             params["q"] = query
         if label_ids:
             params["labelIds"] = label_ids
 
-        response = await self.client.get(
-            url, headers=self._get_headers(), params=params
-        )
-        response.raise_for_status()
-
-        messages_data = response.json()
-        messages = []
-
-        for msg in messages_data.get("messages", []):
-            message_detail = await self.get_message(msg["id"])
-            if message_detail:
-                messages.append(message_detail)
-
-        return messages
+        return params
 
     async def get_message(self, message_id: str) -> Optional[Email]:
-        url = f"{self.API_ENDPOINT}/users/me/messages/{message_id}"
-        params = {"format": "full"}
-
-        response = await self.client.get(
-            url, headers=self._get_headers(), params=params
+        return await cached(
+            ("message", message_id),
+            self.config.cache_ttl,
+            lambda: self._fetch_message(message_id),
         )
-        response.raise_for_status()
 
-        data = response.json()
-        headers = {
-            h["name"]: h["value"] for h in data.get("payload", {}).get("headers", [])
-        }
+    async def _fetch_message(self, message_id: str) -> Optional[Email]:
+        url = self._MESSAGE_URL + message_id
+        params = {"format": "full", "fields": _MESSAGE_FIELDS}
+
+        response = await self._request("GET", url, params=params)
+
+        data = read_json(response)
+        payload = data.get("payload", {})
+        headers = {h["name"]: h["value"] for h in payload.get("headers", ())}
+        label_ids = data.get("labelIds", [])
 
         snippet = data.get("snippet", "")
-        body = self._extract_body(data.get("payload", {}))
+        body = self._extract_body(payload)
 
         return Email(
             id=data["id"],
@@ -120,21 +203,39 @@ class GmailClient:
             snippet=snippet,
             body=body,
             date=headers.get("Date", ""),
-            is_unread="UNREAD" in data.get("labelIds", []),
-            labels=data.get("labelIds", []),
+            is_unread="UNREAD" in label_ids,
+            labels=label_ids,
         )
 
+    async def get_messages(
+        self,
+        message_ids: List[str],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        skip_missing: bool = False,
+    ) -> List[Email]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(message_id: str) -> Optional[Email]:
+            async with semaphore:
+                try:
+                    return await self.get_message(message_id)
+                except httpx.HTTPStatusError as e:
+                    if skip_missing and e.response.status_code == 404:
+                        return None
+                    raise
+
+        results = await asyncio.gather(*(fetch(i) for i in message_ids))
+        return [message for message in results if message]
+
     def _extract_body(self, payload: Dict[str, Any]) -> str:
-        if "body" in payload and payload["body"].get("data"):
-            return base64.urlsafe_b64decode(payload["body"]["data"]).decode("utf-8")
+        if data := payload.get("body", {}).get("data"):
+            return base64.urlsafe_b64decode(data).decode("utf-8")
 
-        if "parts" in payload:
-            for part in payload["parts"]:
-                if part.get("mimeType") == "text/plain":
-                    if part.get("body", {}).get("data"):
-                        return base64.urlsafe_b64decode(part["body"]["data"]).decode(
-                            "utf-8"
-                        )
+        for part in payload.get("parts", ()):
+            if part.get("mimeType") == "text/plain" and (
+                data := part.get("body", {}).get("data")
+            ):
+                return base64.urlsafe_b64decode(data).decode("utf-8")
 
         return ""
 
@@ -156,13 +257,12 @@ class GmailClient:
 
         encoded_message = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
 
-        url = f"{self.API_ENDPOINT}/users/me/messages/send"
+        url = self._SEND_URL
         data = {"raw": encoded_message}
 
-        response = await self.client.post(url, headers=self._get_headers(), json=data)
-        response.raise_for_status()
+        response = await self._request("POST", url, content=json_dumps(data))
 
-        return response.json()
+        return read_json(response)
 
     async def search_messages(self, query: str, max_results: int = 10) -> List[Email]:
         return await self.list_messages(query=query, max_results=max_results)
@@ -171,18 +271,46 @@ class GmailClient:
         return await self.list_messages(label_ids=["UNREAD"], max_results=max_results)
 
     async def mark_as_read(self, message_id: str) -> Dict[str, Any]:
-        url = f"{self.API_ENDPOINT}/users/me/messages/{message_id}/modify"
+        url = self._MESSAGE_URL + message_id + "/modify"
         data = {"removeLabelIds": ["UNREAD"]}
 
-        response = await self.client.post(url, headers=self._get_headers(), json=data)
-        response.raise_for_status()
+        await self._request("POST", url, content=json_dumps(data))
+        RESPONSE_CACHE.pop(("message", message_id), None)
 
-        return response.json()
+        return {"id": message_id, "removedLabelIds": ["UNREAD"]}
+
+    async def batch_modify(
+        self,
+        message_ids: List[str],
+        add_label_ids: Optional[List[str]] = None,
+        remove_label_ids: Optional[List[str]] = None,
+    ) -> None:
+        url = self._BATCH_MODIFY_URL
+        data: Dict[str, Any] = {"ids": message_ids}
+
+        if add_label_ids:
+            data["addLabelIds"] = add_label_ids
+        if remove_label_ids:
+            data["removeLabelIds"] = remove_label_ids
+
+        await self._request("POST", url, content=json_dumps(data))
+        for message_id in message_ids:
+            RESPONSE_CACHE.pop(("message", message_id), None)
+
+    async def bulk_mark_as_read(self, message_ids: List[str]) -> None:
+        chunks = [
+            message_ids[i : i + self.BATCH_MODIFY_LIMIT]
+            for i in range(0, len(message_ids), self.BATCH_MODIFY_LIMIT)
+        ]
+        await asyncio.gather(
+            *(self.batch_modify(chunk, remove_label_ids=["UNREAD"]) for chunk in chunks)
+        )
 
     async def delete_message(self, message_id: str) -> None:
-        url = f"{self.API_ENDPOINT}/users/me/messages/{message_id}"
-        response = await self.client.delete(url, headers=self._get_headers())
-        response.raise_for_status()
+        url = self._MESSAGE_URL + message_id
+        await self._request("DELETE", url)
+        RESPONSE_CACHE.pop(("message", message_id), None)
 
     async def close(self):
-        await self.client.aclose()
+        # The HTTP client is shared process-wide and closed on app shutdown
+        self.client = None
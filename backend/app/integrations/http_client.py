@@ -0,0 +1,233 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from cachetools import TLRUCache
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from orjson import dumps as json_dumps, loads as json_loads
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+# Keep the pool larger than the per-call fan-out so the callers' semaphores,
+# not the pool, bound concurrency
+_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# A 5xx may arrive after the server acted, so only requests that are safe to
+# repeat retry on it; POST (send an email, create an event) must not
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"})
+# Raised before the request reached the server, so any method may retry
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+MAX_ATTEMPTS = 5
+MAX_RETRY_AFTER = 60.0
+
+_backoff = wait_exponential_jitter(initial=0.5, max=MAX_RETRY_AFTER)
+
+_SHARED_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENT_LOCK = asyncio.Lock()
+
+# Gmail and Calendar refresh the same token file from worker threads
+_TOKEN_FILE_LOCK = threading.Lock()
+
+TOKEN_REFRESH_SKEW = 60
+
+# API reads cached for every client and session; entries are (ttl, value) so
+# each client's configured TTL applies to its own entries. Keys lead with a
+# kind ("message", "events") so clients never collide
+RESPONSE_CACHE: TLRUCache = TLRUCache(
+    maxsize=2048, ttu=lambda _key, entry, now: now + entry[0]
+)
+
+
+async def get_shared_client() -> httpx.AsyncClient:
+    global _SHARED_CLIENT
+
+    if _SHARED_CLIENT is None or _SHARED_CLIENT.is_closed:
+        async with _CLIENT_LOCK:
+            if _SHARED_CLIENT is None or _SHARED_CLIENT.is_closed:
+                _SHARED_CLIENT = httpx.AsyncClient(limits=_LIMITS)
+
+    return _SHARED_CLIENT
+
+
+async def shutdown_shared_client():
+    global _SHARED_CLIENT
+
+    async with _CLIENT_LOCK:
+        if _SHARED_CLIENT is not None:
+            await _SHARED_CLIENT.aclose()
+            _SHARED_CLIENT = None
+
+
+def write_token_file(token_path: str, token_json: str):
+    # Write a sibling temp file and rename it over the token, so concurrent
+    # refreshes never leave it truncated or interleaved
+    tmp_path = f"{token_path}.tmp"
+    with _TOKEN_FILE_LOCK:
+        with open(tmp_path, "w") as token:
+            token.write(token_json)
+        os.replace(tmp_path, token_path)
+
+
+class TokenAuth:
+    # One per token file, shared by every client that reads it, so Gmail and
+    # Calendar ride on a single refresh. Scopes come from the file itself
+    def __init__(self, token_path: str):
+        self.token_path = token_path
+        self.credentials: Optional[Credentials] = None
+        self._expires_at = float("inf")
+        self._refresh_lock = asyncio.Lock()
+
+        if os.path.exists(token_path):
+            self.credentials = Credentials.from_authorized_user_file(token_path)
+            self._update_expiry()
+        self._headers = self._build_headers()
+
+    def _refresh(self):
+        self.credentials.refresh(Request())
+        write_token_file(self.token_path, self.credentials.to_json())
+
+    def _update_expiry(self):
+        if not (self.credentials and self.credentials.refresh_token):
+            self._expires_at = float("inf")
+            return
+
+        # Without a recorded expiry the token's age is unknown; refresh first
+        if not self.credentials.expiry:
+            self._expires_at = 0.0
+            return
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        remaining = (self.credentials.expiry - now).total_seconds()
+        self._expires_at = time.monotonic() + remaining - TOKEN_REFRESH_SKEW
+
+    def _build_headers(self) -> Dict[str, str]:
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+        if self.credentials and self.credentials.token:
+            headers["Authorization"] = f"Bearer {self.credentials.token}"
+        return headers
+
+    async def headers(self) -> Dict[str, str]:
+        # The blocking refresh runs in a worker thread, never on the loop
+        if time.monotonic() >= self._expires_at:
+            async with self._refresh_lock:
+                if time.monotonic() >= self._expires_at:
+                    await asyncio.to_thread(self._refresh)
+                    self._update_expiry()
+                    self._headers = self._build_headers()
+        return self._headers
+
+    def expire(self, rejected: Dict[str, str]):
+        # Only the token that was rejected is expired; a request that raced a
+        # refresh must not force another one
+        if (
+            rejected is self._headers
+            and self.credentials
+            and self.credentials.refresh_token
+        ):
+            self._expires_at = 0.0
+
+
+_TOKEN_AUTHS: Dict[str, TokenAuth] = {}
+
+
+def get_token_auth(token_path: str) -> TokenAuth:
+    auth = _TOKEN_AUTHS.get(token_path)
+    # Without credentials, look again so a token saved later is picked up
+    if auth is None or auth.credentials is None:
+        auth = _TOKEN_AUTHS[token_path] = TokenAuth(token_path)
+    return auth
+
+
+def save_token(token_path: str, token_json: str):
+    write_token_file(token_path, token_json)
+    _TOKEN_AUTHS.pop(token_path, None)
+
+
+async def cached(key: tuple, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    if ttl <= 0:
+        return await fetch()
+
+    entry = RESPONSE_CACHE.get(key)
+    if entry is not None:
+        return entry[1]
+
+    value = await fetch()
+    RESPONSE_CACHE[key] = (ttl, value)
+    return value
+
+
+def read_json(response: httpx.Response) -> Any:
+    # Empty bodies (204 No Content and friends) need no parse
+    return json_loads(response.content) if response.content else {}
+
+
+def _is_retryable(exc: BaseException, *, idempotent: bool) -> bool:
+    if isinstance(exc, NOT_SENT_ERRORS):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status_code = exc.response.status_code
+        # 429 means the request was rejected unprocessed
+        return status_code == 429 or (
+            idempotent and status_code in RETRYABLE_STATUS_CODES
+        )
+    return False
+
+
+def _retry_after_wait(retry_state: RetryCallState) -> float:
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+    return _backoff(retry_state)
+
+
+async def send_with_retry(
+    client: httpx.AsyncClient, method: str, url: str, **kwargs: Any
+) -> httpx.Response:
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(
+            partial(_is_retryable, idempotent=method.upper() in IDEMPOTENT_METHODS)
+        ),
+        wait=_retry_after_wait,
+        stop=stop_after_attempt(MAX_ATTEMPTS),
+        reraise=True,
+    ):
+        with attempt:
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+    return response
+
+
+async def send_authorized(
+    client: httpx.AsyncClient, auth: TokenAuth, method: str, url: str, **kwargs: Any
+) -> httpx.Response:
+    headers = await auth.headers()
+    try:
+        return await send_with_retry(client, method, url, headers=headers, **kwargs)
+    except httpx.HTTPStatusError as e:
+        # A 401 means the token was refused before its recorded expiry; the
+        # request was not acted on, so one retry with a fresh token is safe
+        if e.response.status_code != 401:
+            raise
+        auth.expire(headers)
+        if (fresh_headers := await auth.headers()) is headers:
+            raise
+        return await send_with_retry(
+            client, method, url, headers=fresh_headers, **kwargs
+        )
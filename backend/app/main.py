@@ -1,15 +1,20 @@
 import asyncio
-import base64
-import json
+import gzip
 import logging
-import struct
 import os
-from typing import Any
+from array import array
+from collections import deque
+from typing import Any, Awaitable, Callable
 from pathlib import Path
 from datetime import datetime
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from functools import cache, lru_cache, partial
+from operator import attrgetter
+
+import orjson
+from fastapi import FastAPI, WebSocket, Request
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 from agents.realtime import (
     RealtimeRunner,
     RealtimeSession,
@@ -20,7 +25,16 @@ from agents.tool import FunctionTool
 from typing_extensions import assert_never
 
 from .agents.email_tools import EmailTools
+from .agents.email_tools import FUNCTION_DEFINITIONS as EMAIL_FUNCTION_DEFINITIONS
 from .agents.calendar_tools import CalendarTools
+from .agents.calendar_tools import FUNCTION_DEFINITIONS as CALENDAR_FUNCTION_DEFINITIONS
+from .integrations.calendar import GoogleCalendarClient
+from .integrations.gmail import GmailClient
+from .integrations.http_client import (
+    get_shared_client,
+    save_token,
+    shutdown_shared_client,
+)
 
 from google_auth_oauthlib.flow import Flow
 
@@ -53,7 +67,18 @@ Make sure, your voice AND text are well understandable.
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Agent")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive pool for every session's Gmail and Calendar calls
+    app.state.http_client = await get_shared_client()
+    yield
+    await shutdown_shared_client()
+
+
+app = FastAPI(
+    title="AI Agent", lifespan=lifespan, default_response_class=ORJSONResponse
+)
 
 SCOPES = [
     "https://www.googleapis.com/auth/gmail.modify",
@@ -63,13 +88,218 @@ SCOPES = [
 REDIRECT_URI = "http://localhost:8000/auth/google/callback"
 
 
+@lru_cache(maxsize=1)
+def _load_client_config() -> dict[str, Any]:
+    # credentials.json is static once present; misses are not cached because
+    # the caller checks for the file first
+    with open("credentials.json", "rb") as f:
+        return orjson.loads(f.read())
+
+
+def _build_flow() -> Flow:
+    # A fresh flow per request: authorization_url() and fetch_token() mutate
+    # the flow, so concurrent logins must not share one
+    return Flow.from_client_config(
+        _load_client_config(),
+        scopes=SCOPES,
+        redirect_uri=REDIRECT_URI,
+    )
+
+
+# Upper bounds on events coalesced into one WebSocket frame
+MAX_SEND_BATCH = 32
+MAX_SEND_BATCH_BYTES = 64 * 1024
+
+TRANSCRIPT_DELTA = "response.audio_transcript.delta"
+
+# Seconds over which consecutive transcript deltas are merged into one event
+TRANSCRIPT_COALESCE_WINDOW = 0.02
+
+# History item dumps kept for reuse across history events
+DUMP_CACHE_SIZE = 4096
+
+# Events buffered per session before the event loop waits on the socket
+SEND_QUEUE_SIZE = 1024
+
+# Trailing messages of a saved conversation replayed to the model on connect
+CONTEXT_SUMMARY_MESSAGES = 10
+
+# Audio goes out as its own binary frame: opcode, big-endian uint16 header
+# length, JSON header, then raw PCM16. JSON frames start with "{" or "[".
+# Inbound audio is the opcode followed directly by PCM16
+AUDIO_FRAME_OPCODE = b"\x01"
+
+
+def _audio_frame(header: dict[str, Any], pcm: bytes) -> bytes:
+    header_bytes = orjson.dumps(header)
+    return b"".join(
+        (AUDIO_FRAME_OPCODE, len(header_bytes).to_bytes(2, "big"), header_bytes, pcm)
+    )
+
+
+async def _invoke_tool(context, arguments_json: str, *, name: str, tools_key: str):
+    tool_instance = context.context[tools_key]
+    args = orjson.loads(arguments_json)
+    return await tool_instance.execute_function(name, args)
+
+
+def _build_tools(
+    function_definitions: list[dict[str, Any]], tools_key: str
+) -> list[FunctionTool]:
+    # Schemas are static, so tools are built once per process; the shared
+    # invoker finds the connecting session's tool instances through the run
+    # context
+    return [
+        FunctionTool(
+            name=func_def["name"],
+            description=func_def["description"],
+            params_json_schema=func_def["parameters"],
+            on_invoke_tool=partial(
+                _invoke_tool, name=func_def["name"], tools_key=tools_key
+            ),
+        )
+        for func_def in function_definitions
+    ]
+
+
+TOOLS = [
+    *_build_tools(EMAIL_FUNCTION_DEFINITIONS, "email_tools"),
+    *_build_tools(CALENDAR_FUNCTION_DEFINITIONS, "calendar_tools"),
+]
+
+AGENT = RealtimeAgent(
+    name="Assistant",
+    instructions=INSTRUCTIONS,
+    tools=TOOLS,
+)
+
+RUNNER_CONFIG = {
+    "model_settings": {
+        "model_name": "gpt-realtime-mini",
+        # "voice": "ash",
+        # "modalities": ["audio", "text"],
+        # "input_audio_format": "pcm16",
+        # "output_audio_format": "pcm16",
+        # "input_audio_transcription": {"model": "gpt-4o-mini-transcribe"},
+        # "turn_detection": {
+        #     "type": "semantic_vad",
+        #     "interrupt_response": True,
+        # },
+    }
+}
+
+
+_MISSING = object()
+
+
+@cache
+def _has_tool_call_id(event_type: type) -> bool:
+    # Session events are dataclasses from a small closed set, so each class's
+    # fields are checked once
+    return "tool_call_id" in getattr(event_type, "__dataclass_fields__", ())
+
+
+def _tool_call_id(event) -> str | None:
+    return event.tool_call_id if _has_tool_call_id(type(event)) else None
+
+
+def _tool_output(event) -> str:
+    # Clients always get tool output as a string; only non-strings pay for str()
+    output = event.output
+    return output if isinstance(output, str) else str(output)
+
+
+def _error_text(event) -> str:
+    error = getattr(event, "error", _MISSING)
+    return "Unknown error" if error is _MISSING else str(error)
+
+
+_AGENT_NAME = attrgetter("agent.name")
+_TOOL_NAME = attrgetter("tool.name")
+_ITEM_ID = attrgetter("item_id")
+
+# Events that only copy a few attributes into the payload: output key and
+# getter per field, resolved once at import
+_SIMPLE_FIELDS: dict[str, tuple[tuple[str, Callable[[Any], Any]], ...]] = {
+    "agent_start": (("agent", _AGENT_NAME),),
+    "agent_end": (("agent", _AGENT_NAME),),
+    "handoff": (
+        ("from", attrgetter("from_agent.name")),
+        ("to", attrgetter("to_agent.name")),
+    ),
+    "tool_start": (("tool", _TOOL_NAME), ("tool_call_id", _tool_call_id)),
+    "tool_end": (
+        ("tool", _TOOL_NAME),
+        ("output", _tool_output),
+        ("tool_call_id", _tool_call_id),
+    ),
+    "audio": (("item_id", _ITEM_ID),),
+    "audio_interrupted": (("item_id", _ITEM_ID),),
+    "audio_end": (("item_id", _ITEM_ID),),
+    "guardrail_tripped": (("message", attrgetter("message")),),
+    "error": (("error", _error_text),),
+    "input_audio_timeout_triggered": (),
+}
+
+
+def _extract_text(content: list[dict[str, Any]] | None) -> str:
+    return " ".join(
+        text
+        for content_item in content or ()
+        if isinstance(content_item, dict)
+        and (text := content_item.get("text") or content_item.get("transcript"))
+    )
+
+
+def _drop_queued_audio(queue: asyncio.Queue[bytes]):
+    # Audio still waiting to go out was cut off by the interruption; drop it so
+    # the interrupt reaches the client ahead of stale speech. Nothing awaits in
+    # between, so the writer cannot observe the queue half-drained
+    frames = []
+    while not queue.empty():
+        frame = queue.get_nowait()
+        if not frame.startswith(AUDIO_FRAME_OPCODE):
+            frames.append(frame)
+    for frame in frames:
+        queue.put_nowait(frame)
+
+
+def _join_frames(frames: list[bytes]) -> bytes:
+    if len(frames) == 1:
+        return frames[0]
+    return b"[" + b",".join(frames) + b"]"
+
+
 class ContextManager:
-    def __init__(self, context_file: str = "data/conversation_context.json"):
+    def __init__(self, context_file: str = "data/conversation_context.json.gz"):
         self.context_file = Path(context_file)
+        # Contexts saved before compression sit alongside as plain JSON; they
+        # are still read and are replaced on the next save
+        self.legacy_file = self.context_file.with_suffix("")
+        # ((path, st_mtime_ns), parsed context) of the last load; callers
+        # treat the parsed context as read-only
+        self._cached: tuple[tuple[Path, int], dict[str, Any]] | None = None
+        # History lists are replaced, never mutated, so identity tells whether
+        # this one is already on disk
+        self._saved_history: list[dict[str, Any]] | None = None
+        self._save_lock = asyncio.Lock()
+
+    def _write_context(self, context_data: dict[str, Any]):
+        # Write a sibling temp file and rename over the original, so readers
+        # never see a half-written context
+        tmp_file = self.context_file.with_suffix(".tmp")
+        tmp_file.write_bytes(
+            gzip.compress(orjson.dumps(context_data, default=str), compresslevel=6)
+        )
+        os.replace(tmp_file, self.context_file)
+        self.legacy_file.unlink(missing_ok=True)
 
-    def save_context(
+    async def save_context(
         self, history: list[dict[str, Any]], metadata: dict[str, Any] = None
     ):
+        if history is self._saved_history:
+            return
+
         try:
             context_data = {
                 "saved_at": datetime.now().isoformat(),
@@ -77,159 +307,146 @@ class ContextManager:
                 "history": history,
             }
 
-            with open(self.context_file, "w") as f:
-                json.dump(context_data, f, indent=2, default=str)
+            async with self._save_lock:
+                await asyncio.to_thread(self._write_context, context_data)
+            self._cached = None
+            self._saved_history = history
 
-            logger.info(f"Context saved successfully to {self.context_file}")
+            logger.info("Context saved successfully to %s", self.context_file)
         except Exception as e:
-            logger.error(f"Failed to save context: {e}", exc_info=True)
+            logger.error("Failed to save context: %s", e, exc_info=True)
 
     def load_context(self) -> dict[str, Any] | None:
         try:
-            if not self.context_file.exists():
+            for path in (self.context_file, self.legacy_file):
+                try:
+                    key = (path, path.stat().st_mtime_ns)
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
                 logger.info("No saved context found")
                 return None
 
-            with open(self.context_file, "r") as f:
-                context_data = json.load(f)
+            if self._cached is not None and self._cached[0] == key:
+                return self._cached[1]
+
+            raw = path.read_bytes()
+            if path is self.context_file:
+                raw = gzip.decompress(raw)
+            context_data = orjson.loads(raw)
+            self._cached = (key, context_data)
+            self._saved_history = context_data.get("history")
 
-            logger.info(f"Context loaded successfully from {self.context_file}")
+            logger.info("Context loaded successfully from %s", path)
             return context_data
         except Exception as e:
-            logger.error(f"Failed to load context: {e}", exc_info=True)
+            logger.error("Failed to load context: %s", e, exc_info=True)
             return None
 
     def clear_context(self):
+        self._cached = None
+        self._saved_history = None
         try:
-            if self.context_file.exists():
-                self.context_file.unlink()
-                logger.info("Context cleared successfully")
+            for path in (self.context_file, self.legacy_file):
+                path.unlink(missing_ok=True)
+            logger.info("Context cleared successfully")
         except Exception as e:
-            logger.error(f"Failed to clear context: {e}", exc_info=True)
+            logger.error("Failed to clear context: %s", e, exc_info=True)
+
+
+@dataclass(slots=True, kw_only=True)
+class SessionState:
+    websocket: WebSocket
+    session: RealtimeSession
+    session_context: Any
+    email_tools: EmailTools
+    calendar_tools: CalendarTools
+    send_queue: asyncio.Queue[bytes] = field(
+        default_factory=lambda: asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+    )
+    history_items: dict[str, tuple[Any, dict[str, Any]]] = field(default_factory=dict)
 
 
 class RealtimeWebSocketManager:
     def __init__(self):
-        self.active_sessions: dict[str, RealtimeSession] = {}
-        self.session_contexts: dict[str, Any] = {}
-        self.websockets: dict[str, WebSocket] = {}
-        self.email_tools: dict[str, EmailTools] = {}
-        self.calendar_tools: dict[str, CalendarTools] = {}
+        # Everything a session owns sits on one record, so each operation
+        # costs a single lookup
+        self.sessions: dict[int, SessionState] = {}
         self.context_manager = ContextManager()
         self.current_history: list[dict[str, Any]] = []
+        self._dump_cache: dict[int, tuple[Any, dict[str, Any]]] = {}
+        # One dict lookup per event instead of walking an elif chain
+        self._serializers: dict[
+            str, Callable[[SessionState, Any, dict[str, Any]], None]
+        ] = {
+            **dict.fromkeys(_SIMPLE_FIELDS, self._serialize_fields),
+            "history_updated": self._serialize_history_updated,
+            "history_added": self._serialize_history_added,
+            "raw_model_event": self._serialize_raw_model_event,
+        }
+        self._inbound: dict[
+            str, Callable[[str, dict[str, Any]], Awaitable[None]]
+        ] = {
+            "audio": self._handle_audio,
+            "text": self._handle_text,
+            "interrupt": self._handle_interrupt,
+            "history_resync": self._handle_history_resync,
+        }
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: int):
         await websocket.accept()
-        self.websockets[session_id] = websocket
-        logger.info(f"Client connected: {session_id}")
-
-        email_tools = EmailTools()
-        calendar_tools = CalendarTools()
-
-        self.email_tools[session_id] = email_tools
-        self.calendar_tools[session_id] = calendar_tools
-
-        tools = []
+        logger.info("Client connected: %s", session_id)
 
-        for func_def in email_tools.get_function_definitions():
-            func_name = func_def["name"]
+        http_client = websocket.app.state.http_client
+        email_tools = EmailTools(GmailClient(client=http_client))
+        calendar_tools = CalendarTools(GoogleCalendarClient(client=http_client))
 
-            def create_handler(tool_instance=email_tools, name=func_name):
-                async def handler(context, arguments_json):
-                    args = json.loads(arguments_json)
-                    result = await tool_instance.execute_function(name, args)
-                    return result
+        # The runner owns its model connection, so only the agent and config
+        # are shared between sessions
+        runner = RealtimeRunner(AGENT, config=RUNNER_CONFIG)
 
-                return handler
-
-            tool = FunctionTool(
-                name=func_def["name"],
-                description=func_def["description"],
-                params_json_schema=func_def["parameters"],
-                on_invoke_tool=create_handler(),
-            )
-            tools.append(tool)
-
-        for func_def in calendar_tools.get_function_definitions():
-            func_name = func_def["name"]
-
-            def create_handler(tool_instance=calendar_tools, name=func_name):
-                async def handler(context, arguments_json):
-                    args = json.loads(arguments_json)
-                    result = await tool_instance.execute_function(name, args)
-                    return result
-
-                return handler
-
-            tool = FunctionTool(
-                name=func_def["name"],
-                description=func_def["description"],
-                params_json_schema=func_def["parameters"],
-                on_invoke_tool=create_handler(),
-            )
-            tools.append(tool)
-
-        agent = RealtimeAgent(
-            name="Assistant",
-            instructions=INSTRUCTIONS,
-            tools=tools,
+        session_context = await runner.run(
+            context={"email_tools": email_tools, "calendar_tools": calendar_tools}
         )
-
-        runner = RealtimeRunner(
-            agent,
-            config={
-                "model_settings": {
-                    "model_name": "gpt-realtime-mini",
-                }
-            },
-            #         "voice": "ash",
-            #         "modalities": ["audio", "text"],
-            #         "input_audio_format": "pcm16",
-            #         "output_audio_format": "pcm16",
-            #         "input_audio_transcription": {"model": "gpt-4o-mini-transcribe"},
-            #         "turn_detection": {
-            #             "type": "semantic_vad",
-            #             "interrupt_response": True,
-            #         },
-            #     }
-            # },
-        )
-
-        session_context = await runner.run()
         session = await session_context.__aenter__()
 
-        self.active_sessions[session_id] = session
-        self.session_contexts[session_id] = session_context
-
-        asyncio.create_task(self._process_events(session_id))
-        logger.info(f"Session started: {session_id}")
+        self.sessions[session_id] = SessionState(
+            websocket=websocket,
+            session=session,
+            session_context=session_context,
+            email_tools=email_tools,
+            calendar_tools=calendar_tools,
+        )
+        logger.info("Session started: %s", session_id)
 
         saved_context = self.context_manager.load_context()
         if saved_context and saved_context.get("history"):
             self.current_history = saved_context["history"]
             logger.info(
-                f"Loaded {len(self.current_history)} history items from previous session"
+                "Loaded %d history items from previous session",
+                len(self.current_history),
             )
 
             try:
-                await websocket.send_text(
-                    json.dumps(
+                await websocket.send_bytes(
+                    orjson.dumps(
                         {"type": "history_loaded", "history": self.current_history}
                     )
                 )
             except Exception as e:
-                logger.error(f"Failed to send loaded history: {e}")
+                logger.error("Failed to send loaded history: %s", e)
 
             context_summary = self._build_context_summary(self.current_history)
             if context_summary:
                 logger.info(
-                    f"Sending context summary to OpenAI: {context_summary[:100]}..."
+                    "Sending context summary to OpenAI: %.100s...", context_summary
                 )
                 await session.send_message(context_summary)
 
-    async def disconnect(self, session_id: str):
+    async def disconnect(self, session_id: int):
         if self.current_history:
-            self.context_manager.save_context(
+            await self.context_manager.save_context(
                 self.current_history,
                 metadata={
                     "session_id": session_id,
@@ -237,227 +454,330 @@ class RealtimeWebSocketManager:
                 },
             )
 
-        if session_id in self.session_contexts:
-            await self.session_contexts[session_id].__aexit__(None, None, None)
-            del self.session_contexts[session_id]
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
-        if session_id in self.websockets:
-            del self.websockets[session_id]
-        if session_id in self.email_tools:
-            await self.email_tools[session_id].close()
-            del self.email_tools[session_id]
-        if session_id in self.calendar_tools:
-            await self.calendar_tools[session_id].close()
-            del self.calendar_tools[session_id]
-        logger.info(f"Session disconnected: {session_id}")
-
-    async def send_audio(self, session_id: str, audio_bytes: bytes):
-        if session_id in self.active_sessions:
-            await self.active_sessions[session_id].send_audio(audio_bytes)
-
-    async def send_message(self, session_id: str, message: str):
-        if session_id in self.active_sessions:
-            await self.active_sessions[session_id].send_message(message)
-
-    async def interrupt(self, session_id: str):
-        if session_id in self.active_sessions:
-            await self.active_sessions[session_id].interrupt()
+        # Guard each close, so one failing cleanup does not leave the remaining
+        # resources behind
+        state = self.sessions.pop(session_id, None)
+        if state is not None:
+            try:
+                await state.session_context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.error("Failed to close session %s: %s", session_id, e)
+
+            for tools in (state.email_tools, state.calendar_tools):
+                try:
+                    await tools.close()
+                except Exception as e:
+                    logger.error("Failed to close tools for %s: %s", session_id, e)
+
+        logger.info("Session disconnected: %s", session_id)
+
+    async def send_audio(self, session_id: int, audio_bytes: bytes):
+        state = self.sessions.get(session_id)
+        if state is not None:
+            await state.session.send_audio(audio_bytes)
+
+    async def send_message(self, session_id: int, message: str):
+        state = self.sessions.get(session_id)
+        if state is not None:
+            await state.session.send_message(message)
+
+    async def interrupt(self, session_id: int):
+        state = self.sessions.get(session_id)
+        if state is not None:
+            await state.session.interrupt()
+
+    async def handle_message(self, session_id: int, message: dict[str, Any]):
+        message_type = message.get("type")
+        handler = self._inbound.get(message_type)
+        if handler is None:
+            logger.warning("Unknown message type: %s", message_type)
+            return
+        await handler(session_id, message)
+
+    async def _handle_audio(self, session_id: int, message: dict[str, Any]):
+        audio_bytes = array("h", message.get("data", [])).tobytes()
+        await self.send_audio(session_id, audio_bytes)
+
+    async def _handle_text(self, session_id: int, message: dict[str, Any]):
+        await self.send_message(session_id, message.get("text", ""))
+
+    async def _handle_interrupt(self, session_id: int, message: dict[str, Any]):
+        await self.interrupt(session_id)
+
+    async def _handle_history_resync(self, session_id: int, message: dict[str, Any]):
+        # Full snapshot of the same per-session items the history_updated
+        # patches and their total describe; queued so the writer keeps order
+        state = self.sessions.get(session_id)
+        if state is not None:
+            history = [item_dump for _, item_dump in state.history_items.values()]
+            await state.send_queue.put(
+                orjson.dumps(
+                    {"type": "history_resync", "history": history}, default=str
+                )
+            )
 
     def _build_context_summary(self, history: list[dict[str, Any]]) -> str:
-        messages = []
+        messages: deque[str] = deque(maxlen=CONTEXT_SUMMARY_MESSAGES)
         for item in history:
             if item.get("type") == "message" and item.get("content"):
-                role = item.get("role", "unknown")
-                texts = []
-                for content_item in item["content"]:
-                    if isinstance(content_item, dict):
-                        text = content_item.get("text") or content_item.get(
-                            "transcript"
-                        )
-                        if text:
-                            texts.append(text)
-                if texts:
-                    combined_text = " ".join(texts)
+                if combined_text := _extract_text(item["content"]):
+                    role = item.get("role", "unknown")
                     messages.append(f"{role}: {combined_text}")
 
         if not messages:
             return ""
 
-        summary = "Previous conversation context:\n" + "\n".join(messages[-10:])
-        return summary
+        return "Previous conversation context:\n" + "\n".join(messages)
 
-    async def _process_events(self, session_id: str):
+    async def process_events(self, session_id: int):
         try:
-            session = self.active_sessions.get(session_id)
-            websocket = self.websockets.get(session_id)
-
-            if not session or not websocket:
+            state = self.sessions.get(session_id)
+            if state is None:
                 return
 
-            async for event in session:
-                event_data = await self._serialize_event(event)
-                await websocket.send_text(json.dumps(event_data))
+            queue = state.send_queue
+
+            loop = asyncio.get_running_loop()
+            # Transcript deltas for one item are merged until
+            # TRANSCRIPT_COALESCE_WINDOW after the first one, then queued even
+            # if no further event arrives. Audio may overtake a pending delta;
+            # any other event flushes it first so history ordering holds
+            pending: dict[str, Any] | None = None
+            pending_since = 0.0
+
+            events = aiter(state.session)
+            next_event: asyncio.Future | None = None
+            try:
+                while True:
+                    # Only a pending delta needs a deadline, so only then is the
+                    # next event wrapped in a future; waiting on it rather than
+                    # wait_for leaves the session iterator untouched on timeout
+                    if pending is not None:
+                        if next_event is None:
+                            next_event = asyncio.ensure_future(anext(events))
+                        remaining = (
+                            pending_since + TRANSCRIPT_COALESCE_WINDOW - loop.time()
+                        )
+                        done, _ = await asyncio.wait(
+                            (next_event,), timeout=max(remaining, 0)
+                        )
+                        if not done:
+                            await queue.put(orjson.dumps(pending))
+                            pending = None
+                            continue
+
+                    # A future left in flight by a flush still owns the next
+                    # event; otherwise read the iterator directly
+                    try:
+                        if next_event is not None:
+                            event = await next_event
+                        else:
+                            event = await anext(events)
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        next_event = None
+
+                    event_data = await self._serialize_event(state, event)
+                    is_delta = event_data["type"] == TRANSCRIPT_DELTA
+
+                    if pending is not None and (
+                        event.type != "audio"
+                        and not (
+                            is_delta
+                            and event_data.get("item_id") == pending.get("item_id")
+                        )
+                    ):
+                        await queue.put(orjson.dumps(pending))
+                        pending = None
+
+                    if is_delta:
+                        if pending is None:
+                            pending, pending_since = event_data, loop.time()
+                        else:
+                            pending["delta"] += event_data["delta"]
+                        continue
+
+                    if event.type == "audio_interrupted":
+                        _drop_queued_audio(queue)
+
+                    # A full queue parks this loop until the writer catches up,
+                    # instead of buffering without bound behind a slow client
+                    if event.type == "audio":
+                        await queue.put(_audio_frame(event_data, event.audio.data))
+                    else:
+                        # Values orjson cannot encode natively fall back to
+                        # str()
+                        await queue.put(orjson.dumps(event_data, default=str))
+
+                # The stream ended; the transcript tail still goes out
+                if pending is not None:
+                    await queue.put(orjson.dumps(pending))
+                    pending = None
+            finally:
+                if next_event is not None:
+                    next_event.cancel()
+                # Cancelled or failed: hand over the tail without waiting on
+                # a writer that may be gone
+                if pending is not None:
+                    with suppress(asyncio.QueueFull):
+                        queue.put_nowait(orjson.dumps(pending))
 
         except Exception as e:
             logger.error(
-                f"Error processing events for session {session_id}: {e}", exc_info=True
+                "Error processing events for session %s: %s",
+                session_id,
+                e,
+                exc_info=True,
             )
 
-    async def _serialize_event(self, event: RealtimeSessionEvent) -> dict[str, Any]:
+    async def write_events(self, session_id: int):
+        # Single writer per socket: JSON events that pile up while a send is in
+        # flight go out together as one array frame; audio frames stay separate
+        # and keep their place in the stream
+        try:
+            state = self.sessions[session_id]
+            websocket = state.websocket
+            queue = state.send_queue
+
+            while True:
+                frames = [await queue.get()]
+                size = len(frames[0])
+                while (
+                    len(frames) < MAX_SEND_BATCH
+                    and size < MAX_SEND_BATCH_BYTES
+                    and not queue.empty()
+                ):
+                    frame = queue.get_nowait()
+                    frames.append(frame)
+                    size += len(frame)
+
+                batch = []
+                for frame in frames:
+                    if frame.startswith(AUDIO_FRAME_OPCODE):
+                        if batch:
+                            await websocket.send_bytes(_join_frames(batch))
+                            batch = []
+                        await websocket.send_bytes(frame)
+                    else:
+                        batch.append(frame)
+                if batch:
+                    await websocket.send_bytes(_join_frames(batch))
+
+        except Exception as e:
+            logger.error(
+                "Error sending events for session %s: %s", session_id, e, exc_info=True
+            )
+
+    async def _serialize_event(
+        self, state: SessionState, event: RealtimeSessionEvent
+    ) -> dict[str, Any]:
         base_event: dict[str, Any] = {
             "type": event.type,
         }
 
-        if event.type == "agent_start":
-            base_event["agent"] = event.agent.name
-        elif event.type == "agent_end":
-            base_event["agent"] = event.agent.name
-        elif event.type == "handoff":
-            base_event["from"] = event.from_agent.name
-            base_event["to"] = event.to_agent.name
-        elif event.type == "tool_start":
-            base_event["tool"] = event.tool.name
-            base_event["tool_call_id"] = getattr(event, "tool_call_id", None)
-        elif event.type == "tool_end":
-            base_event["tool"] = event.tool.name
-            base_event["output"] = str(event.output)
-            base_event["tool_call_id"] = getattr(event, "tool_call_id", None)
-        elif event.type == "audio":
-            base_event["audio"] = base64.b64encode(event.audio.data).decode("utf-8")
-            base_event["item_id"] = event.item_id
-        elif event.type == "audio_interrupted":
-            base_event["item_id"] = event.item_id
-        elif event.type == "audio_end":
-            base_event["item_id"] = event.item_id
-        elif event.type == "history_updated":
-            base_event["history"] = [item.model_dump() for item in event.history]
-
-            self.current_history = base_event["history"]
-
-            if event.history:
-                last_item = event.history[-1]
-                if hasattr(last_item, "role") and last_item.role == "assistant":
-                    text_parts = []
-                    if hasattr(last_item, "content") and last_item.content:
-                        for content_item in last_item.content:
-                            if hasattr(content_item, "text") and content_item.text:
-                                text_parts.append(content_item.text)
-                            elif (
-                                hasattr(content_item, "transcript")
-                                and content_item.transcript
-                            ):
-                                text_parts.append(content_item.transcript)
-                    if text_parts:
-                        final_text = " ".join(text_parts)
-                        base_event["last_assistant_message"] = final_text
-                        logger.info(f"Last assistant message: {final_text}")
-        elif event.type == "history_added":
-            base_event["item"] = event.item.model_dump()
-            if hasattr(event.item, "content") and event.item.content:
-                text_parts = []
-                for content_item in event.item.content:
-                    if hasattr(content_item, "text") and content_item.text:
-                        text_parts.append(content_item.text)
-                    elif (
-                        hasattr(content_item, "transcript") and content_item.transcript
-                    ):
-                        text_parts.append(content_item.transcript)
-                if text_parts:
-                    base_event["text"] = " ".join(text_parts)
-        elif event.type == "guardrail_tripped":
-            base_event["message"] = event.message
-        elif event.type == "raw_model_event":
-            base_event["raw_event"] = event.data.type
-
-            if event.data.type == "transcript_delta":
-                delta = None
-                transcript = None
-                item_id = None
-
-                if hasattr(event.data, "delta"):
-                    delta = event.data.delta
-
-                if hasattr(event.data, "transcript"):
-                    transcript = event.data.transcript
-
-                if hasattr(event.data, "item_id"):
-                    item_id = event.data.item_id
-
-                if not delta or not transcript:
-                    event_dict = (
-                        event.data.model_dump()
-                        if hasattr(event.data, "model_dump")
-                        else {}
-                    )
+        serializer = self._serializers.get(event.type)
+        if serializer is None:
+            assert_never(event)
+        serializer(state, event, base_event)
 
-                    if not delta:
-                        delta = event_dict.get("delta", "")
-                    if not transcript:
-                        transcript = event_dict.get("transcript", "")
-                    if not item_id:
-                        item_id = event_dict.get("item_id", "")
-
-                if not delta and isinstance(event.data, dict):
-                    delta = event.data.get("delta", "")
-                    transcript = event.data.get("transcript", "")
-                    item_id = event.data.get("item_id", "")
-
-                if delta:
-                    base_event["delta"] = delta
-                    base_event["type"] = "response.audio_transcript.delta"
-                if transcript:
-                    base_event["transcript"] = transcript
-                if item_id:
-                    base_event["item_id"] = item_id
-
-            elif event.data.type == "transcript_done":
-                transcript = None
-                item_id = None
-
-                if hasattr(event.data, "transcript"):
-                    transcript = event.data.transcript
-
-                if hasattr(event.data, "item_id"):
-                    item_id = event.data.item_id
-
-                if not transcript:
-                    event_dict = (
-                        event.data.model_dump()
-                        if hasattr(event.data, "model_dump")
-                        else {}
-                    )
+        return base_event
 
-                    if not transcript:
-                        transcript = event_dict.get("transcript", "")
-                    if not item_id:
-                        item_id = event_dict.get("item_id", "")
+    def _serialize_fields(self, state: SessionState, event, base_event: dict[str, Any]):
+        for key, getter in _SIMPLE_FIELDS[event.type]:
+            base_event[key] = getter(event)
+
+    def _dump_item(self, item) -> dict[str, Any]:
+        # history_added and the history_updated that follows carry the same
+        # item object; keying on id() is safe because the entry keeps the
+        # item alive
+        cached = self._dump_cache.get(id(item))
+        if cached is not None:
+            return cached[1]
+
+        item_dump = item.model_dump()
+        if len(self._dump_cache) >= DUMP_CACHE_SIZE:
+            del self._dump_cache[next(iter(self._dump_cache))]
+        self._dump_cache[id(item)] = (item, item_dump)
+        return item_dump
+
+    def _serialize_history_updated(
+        self, state: SessionState, event, base_event: dict[str, Any]
+    ):
+        history = event.history
+        previous = state.history_items
+        current: dict[str, tuple[Any, dict[str, Any]]] = {}
+        added = []
 
-                if not transcript and isinstance(event.data, dict):
-                    transcript = event.data.get("transcript", "")
-                    item_id = event.data.get("item_id", "")
+        # The SDK swaps in a new object when it updates an item, so an id that
+        # still maps to the same object is unchanged and is not dumped or resent
+        for item in history:
+            entry = previous.get(item.item_id)
+            if entry is None or entry[0] is not item:
+                entry = (item, self._dump_item(item))
+                added.append(entry[1])
+            current[item.item_id] = entry
 
-                if transcript:
-                    base_event["transcript"] = transcript
-                    base_event["type"] = "response.audio_transcript.done"
-                    base_event["text"] = transcript
-                if item_id:
-                    base_event["item_id"] = item_id
+        state.history_items = current
+        self.current_history = [item_dump for _, item_dump in current.values()]
 
-            else:
-                logger.info(
-                    f"🔍 Other raw_model_event type: {event.data.type}, attributes: {dir(event.data) if hasattr(event.data, '__dir__') else 'N/A'}"
-                )
-        elif event.type == "error":
-            base_event["error"] = (
-                str(event.error) if hasattr(event, "error") else "Unknown error"
-            )
-        elif event.type == "input_audio_timeout_triggered":
-            pass
-        else:
-            assert_never(event)
+        base_event["added"] = added
+        base_event["removed"] = [
+            item_id for item_id in previous if item_id not in current
+        ]
+        base_event["total"] = len(current)
 
-        return base_event
+        if self.current_history:
+            last_item = self.current_history[-1]
+            if last_item.get("role") == "assistant":
+                if final_text := _extract_text(last_item.get("content")):
+                    base_event["last_assistant_message"] = final_text
+                    logger.debug("Last assistant message: %s", final_text)
+
+    def _serialize_history_added(
+        self, state: SessionState, event, base_event: dict[str, Any]
+    ):
+        item_dump = self._dump_item(event.item)
+        base_event["item"] = item_dump
+        if text := _extract_text(item_dump.get("content")):
+            base_event["text"] = text
+
+    def _serialize_raw_model_event(
+        self, state: SessionState, event, base_event: dict[str, Any]
+    ):
+        data = event.data
+        base_event["raw_event"] = data.type
+
+        if data.type == "transcript_delta":
+            delta = getattr(data, "delta", None)
+            transcript = getattr(data, "transcript", None)
+            item_id = getattr(data, "item_id", None)
+
+            if delta:
+                base_event["delta"] = delta
+                base_event["type"] = TRANSCRIPT_DELTA
+            if transcript:
+                base_event["transcript"] = transcript
+            if item_id:
+                base_event["item_id"] = item_id
+
+        elif data.type == "transcript_done":
+            transcript = getattr(data, "transcript", None)
+            item_id = getattr(data, "item_id", None)
+
+            if transcript:
+                base_event["transcript"] = transcript
+                base_event["type"] = "response.audio_transcript.done"
+                base_event["text"] = transcript
+            if item_id:
+                base_event["item_id"] = item_id
+
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Other raw_model_event type: %s, attributes: %s",
+                data.type,
+                dir(data),
+            )
 
 
 manager = RealtimeWebSocketManager()
@@ -534,11 +854,7 @@ async def auth_google(request: Request):
             "<p>Please download your OAuth 2.0 credentials from Google Cloud Console</p>"
         )
 
-    flow = Flow.from_client_secrets_file(
-        "credentials.json",
-        scopes=SCOPES,
-        redirect_uri=REDIRECT_URI,
-    )
+    flow = _build_flow()
 
     authorization_url, state = flow.authorization_url(
         access_type="offline",
@@ -556,27 +872,16 @@ async def auth_google_callback(request: Request):
         return HTMLResponse(content="<h1>Error: No authorization code received</h1>")
 
     try:
-        flow = Flow.from_client_secrets_file(
-            "credentials.json",
-            scopes=SCOPES,
-            redirect_uri=REDIRECT_URI,
-        )
-
-        flow.fetch_token(code=code)
+        flow = _build_flow()
 
+        await asyncio.to_thread(flow.fetch_token, code=code)
         credentials = flow.credentials
 
-        token_data = {
-            "token": credentials.token,
-            "refresh_token": credentials.refresh_token,
-            "token_uri": credentials.token_uri,
-            "client_id": credentials.client_id,
-            "client_secret": credentials.client_secret,
-            "scopes": credentials.scopes,
-        }
-
-        with open("token.json", "w") as token_file:
-            json.dump(token_data, token_file)
+        # to_json() records the expiry, so clients refresh ahead of it; the
+        # clients read the same path and pick the new token up on next use
+        save_token(
+            os.getenv("GOOGLE_TOKEN_PATH", "token.json"), credentials.to_json()
+        )
 
         return HTMLResponse(
             content="""
@@ -615,60 +920,72 @@ async def auth_google_callback(request: Request):
         )
 
     except Exception as e:
-        logger.error(f"Error during OAuth callback: {e}", exc_info=True)
+        logger.error("Error during OAuth callback: %s", e, exc_info=True)
         return HTMLResponse(
             content=f"<h1>Error during authentication</h1><p>{str(e)}</p>"
         )
 
 
+async def _receive_frames(websocket: WebSocket, session_id: int):
+    # The session outlives this loop (disconnect runs after it returns), so
+    # audio frames skip the manager's per-call lookup
+    session = manager.sessions[session_id].session
+
+    while True:
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            return
+
+        # Binary frames lead with an opcode; audio carries raw little-endian
+        # PCM16 straight from the client. Control messages stay JSON text
+        if (payload := frame.get("bytes")) is not None:
+            if payload[:1] == AUDIO_FRAME_OPCODE:
+                await session.send_audio(payload[1:])
+            else:
+                logger.warning("Unknown binary frame opcode: %r", payload[:1])
+            continue
+
+        message = orjson.loads(frame["text"])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received message: %s", message.get("type"))
+
+        await manager.handle_message(session_id, message)
+
+
+# Goes out as a text frame on purpose: it checks the client's text path
+_DEBUG_CONNECTED = orjson.dumps(
+    {"type": "debug_text", "text": "WebSocket connected - text path working"}
+).decode()
+
+
 @app.websocket("/ws/realtime")
 async def realtime_proxy(websocket: WebSocket):
-    # session_id = f"session_{id(websocket)}"
-    session_id = f"session_1"  # Do not create new session every time
+    # Integer keys hash in one step on every manager lookup
+    # session_id = id(websocket)
+    session_id = 1  # Do not create new session every time
 
     await manager.connect(websocket, session_id)
 
     try:
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "debug_text",
-                    "text": "WebSocket connected - text path working",
-                }
-            )
-        )
-        logger.info(f"Sent test message to {session_id}")
+        await websocket.send_text(_DEBUG_CONNECTED)
+        logger.info("Sent test message to %s", session_id)
     except Exception as e:
-        logger.error(f"Failed to send test message: {e}")
+        logger.error("Failed to send test message: %s", e)
 
     try:
-        while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            logger.debug(f"Received message: {message}")
-
-            message_type = message.get("type")
-
-            if message_type == "audio":
-                int16_data = message.get("data", [])
-                audio_bytes = struct.pack(f"{len(int16_data)}h", *int16_data)
-                await manager.send_audio(session_id, audio_bytes)
-
-            elif message_type == "text":
-                text = message.get("text", "")
-                await manager.send_message(session_id, text)
+        # The event pump and the writer live exactly as long as this handler
+        async with asyncio.TaskGroup() as tg:
+            events_task = tg.create_task(manager.process_events(session_id))
+            writer_task = tg.create_task(manager.write_events(session_id))
 
-            elif message_type == "interrupt":
-                await manager.interrupt(session_id)
+            await _receive_frames(websocket, session_id)
+            logger.info("WebSocket disconnected: %s", session_id)
 
-            else:
-                logger.warning(f"Unknown message type: {message_type}")
-
-    except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {session_id}")
-        await manager.disconnect(session_id)
+            events_task.cancel()
+            writer_task.cancel()
     except Exception as e:
-        logger.error(f"Error in websocket handler: {e}", exc_info=True)
+        logger.error("Error in websocket handler: %s", e, exc_info=True)
+    finally:
         await manager.disconnect(session_id)
 
 
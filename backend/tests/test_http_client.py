@@ -0,0 +1,126 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from google.oauth2.credentials import Credentials
+
+from app.integrations.http_client import TokenAuth, send_authorized, send_with_retry
+
+URL = "https://example.test/resource"
+
+
+def _run(method: str, responses: list) -> tuple[list[httpx.Request], object]:
+    requests: list[httpx.Request] = []
+    outcomes = iter(responses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        # Retry-After: 0 keeps retries from sleeping
+        return httpx.Response(outcome, headers={"Retry-After": "0"})
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            try:
+                return await send_with_retry(client, method, URL)
+            except httpx.HTTPStatusError as exc:
+                return exc
+
+    return requests, asyncio.run(main())
+
+
+def test_post_is_not_retried_on_server_error():
+    requests, result = _run("POST", [503, 503, 200])
+
+    assert len(requests) == 1
+    assert isinstance(result, httpx.HTTPStatusError)
+    assert result.response.status_code == 503
+
+
+def test_post_is_retried_on_rate_limit():
+    requests, result = _run("POST", [429, 200])
+
+    assert len(requests) == 2
+    assert result.status_code == 200
+
+
+def test_post_is_retried_when_connection_fails():
+    requests, result = _run("POST", [httpx.ConnectError("refused"), 200])
+
+    assert len(requests) == 2
+    assert result.status_code == 200
+
+
+@pytest.mark.parametrize("method", ["GET", "PUT", "PATCH", "DELETE"])
+def test_idempotent_methods_are_retried_on_server_error(method):
+    requests, result = _run(method, [503, 502, 200])
+
+    assert len(requests) == 3
+    assert result.status_code == 200
+
+
+def _token_file(tmp_path, **fields) -> str:
+    token_path = tmp_path / "token.json"
+    token_path.write_text(
+        json.dumps(
+            {
+                "token": "old",
+                "refresh_token": "refresh",
+                "client_id": "id",
+                "client_secret": "secret",
+                **fields,
+            }
+        )
+    )
+    return str(token_path)
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+
+    def refresh(self, request):
+        calls.append(self.token)
+        self.token = f"new-{len(calls)}"
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+            hours=1
+        )
+
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    return calls
+
+
+def _authorized(auth: TokenAuth, statuses: list) -> list[str]:
+    seen: list[str] = []
+    outcomes = iter(statuses)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(next(outcomes))
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await send_authorized(client, auth, "GET", URL)
+
+    asyncio.run(main())
+    return seen
+
+
+def test_token_without_expiry_is_refreshed_before_first_use(tmp_path, refreshes):
+    auth = TokenAuth(_token_file(tmp_path))
+
+    assert _authorized(auth, [200]) == ["Bearer new-1"]
+    assert refreshes == ["old"]
+    assert "expiry" in json.loads(open(auth.token_path).read())
+
+
+def test_rejected_token_is_refreshed_once(tmp_path, refreshes):
+    expiry = (datetime.now(timezone.utc) + timedelta(hours=1)).replace(tzinfo=None)
+    auth = TokenAuth(_token_file(tmp_path, expiry=expiry.isoformat() + "Z"))
+
+    assert _authorized(auth, [401, 200]) == ["Bearer old", "Bearer new-1"]
+    assert refreshes == ["old"]
@@ -5,6 +5,12 @@ interface UseWebRTCOptions {
   onAudio?: (audioData: ArrayBuffer) => void;
 }
 
+const textDecoder = new TextDecoder();
+
+// Binary audio frames: opcode, uint16 header length, JSON header, raw PCM16.
+// Outgoing audio is the opcode followed directly by PCM16
+const AUDIO_FRAME_OPCODE = 0x01;
+
 export function useWebRTC(options: UseWebRTCOptions = {}) {
   const [isConnected, setIsConnected] = useState(false);
   const wsRef = useRef<WebSocket | null>(null);
@@ -12,6 +18,10 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
   const scriptProcessorRef = useRef<ScriptProcessorNode | null>(null);
   const streamRef = useRef<MediaStream | null>(null);
   const processedItemsRef = useRef<Set<string>>(new Set());
+  // Item ids the server's history patches currently describe; checked against
+  // each patch's total to detect a missed patch
+  const historyIdsRef = useRef<Set<string>>(new Set());
+  const resyncPendingRef = useRef(false);
   const playbackAudioContextRef = useRef<AudioContext | null>(null);
   const audioQueueRef = useRef<AudioBuffer[]>([]);
   const isPlayingRef = useRef(false);
@@ -23,10 +33,13 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
   const connect = useCallback(async () => {
     try {
       processedItemsRef.current.clear();
+      historyIdsRef.current.clear();
+      resyncPendingRef.current = false;
 
       const ws = new WebSocket(
         import.meta.env.VITE_WS_URL || "ws://localhost:8000/ws/realtime",
       );
+      ws.binaryType = "arraybuffer";
       wsRef.current = ws;
 
       ws.onopen = () => {
@@ -34,28 +47,37 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
         setIsConnected(true);
       };
 
-      ws.onmessage = async (event) => {
-        const data = JSON.parse(event.data);
+      const handleEvent = (data: any) => {
         console.log("Received event:", data.type, data);
 
         // Handle different event types from backend
-        if (data.type === "audio" && data.audio) {
-          // Decode base64 audio and play it
-          try {
-            const binaryString = atob(data.audio);
-            const bytes = new Uint8Array(binaryString.length);
-            for (let i = 0; i < binaryString.length; i++) {
-              bytes[i] = binaryString.charCodeAt(i);
-            }
-            console.log("Received audio chunk:", bytes.length, "bytes");
-            options.onAudio?.(bytes.buffer);
-            playAudio(bytes.buffer);
-          } catch (error) {
-            console.error("Error decoding audio:", error);
-          }
-        } else if (data.type === "history_updated") {
+        if (data.type === "history_updated") {
           console.log("🎯 history_updated event received");
 
+          const historyIds = historyIdsRef.current;
+          if (Array.isArray(data.added)) {
+            data.added.forEach((item: any) => historyIds.add(item.item_id));
+          }
+          if (Array.isArray(data.removed)) {
+            data.removed.forEach((itemId: string) =>
+              historyIds.delete(itemId),
+            );
+          }
+          if (
+            typeof data.total === "number" &&
+            historyIds.size !== data.total &&
+            !resyncPendingRef.current
+          ) {
+            console.warn(
+              "History out of sync, requesting resync:",
+              historyIds.size,
+              "!=",
+              data.total,
+            );
+            resyncPendingRef.current = true;
+            ws.send(JSON.stringify({ type: "history_resync" }));
+          }
+
           // PRIORITY 1: Check for pre-extracted last_assistant_message
           if (data.last_assistant_message) {
             console.log(
@@ -65,11 +87,11 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
             options.onTranscript?.(data.last_assistant_message, "ai");
           } else {
             console.log(
-              "⚠️ No last_assistant_message, extracting from history array",
+              "⚠️ No last_assistant_message, extracting from history patch",
             );
-            // PRIORITY 2: Extract transcripts from history - only process new items
-            if (data.history && Array.isArray(data.history)) {
-              data.history.forEach((item: any) => {
+            // PRIORITY 2: Extract transcripts from added or changed items
+            if (Array.isArray(data.added)) {
+              data.added.forEach((item: any) => {
                 if (
                   item.item_id &&
                   !processedItemsRef.current.has(item.item_id)
@@ -91,6 +113,23 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
             processHistoryItem(item);
             processedItemsRef.current.add(item.item_id);
           }
+        } else if (data.type === "history_resync") {
+          // Full snapshot; only items not seen in earlier patches are new
+          resyncPendingRef.current = false;
+          if (Array.isArray(data.history)) {
+            historyIdsRef.current = new Set(
+              data.history.map((item: any) => item.item_id),
+            );
+            data.history.forEach((item: any) => {
+              if (
+                item.item_id &&
+                !processedItemsRef.current.has(item.item_id)
+              ) {
+                processHistoryItem(item);
+                processedItemsRef.current.add(item.item_id);
+              }
+            });
+          }
         } else if (data.type === "history_loaded") {
           console.log("📜 Loading saved context");
           if (data.history && Array.isArray(data.history)) {
@@ -103,6 +142,33 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
         }
       };
 
+      ws.onmessage = (event) => {
+        if (
+          event.data instanceof ArrayBuffer &&
+          new Uint8Array(event.data, 0, 1)[0] === AUDIO_FRAME_OPCODE
+        ) {
+          const headerLength = new DataView(event.data).getUint16(1);
+          const pcm = event.data.slice(3 + headerLength);
+          console.log("Received audio chunk:", pcm.byteLength, "bytes");
+          options.onAudio?.(pcm);
+          playAudio(pcm);
+          return;
+        }
+
+        // Other events arrive as binary UTF-8 JSON, either one object or a
+        // batch array; handshake messages as text
+        const payload = JSON.parse(
+          typeof event.data === "string"
+            ? event.data
+            : textDecoder.decode(event.data),
+        );
+        if (Array.isArray(payload)) {
+          payload.forEach(handleEvent);
+        } else {
+          handleEvent(payload);
+        }
+      };
+
       ws.onerror = (error) => {
         console.error("WebSocket error:", error);
       };
@@ -143,12 +209,11 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
             int16Data[i] = sample * 32767;
           }
 
-          ws.send(
-            JSON.stringify({
-              type: "audio",
-              data: Array.from(int16Data),
-            }),
-          );
+          // Raw PCM16 as a binary frame; no JSON number array to build or parse
+          const frame = new Uint8Array(1 + int16Data.byteLength);
+          frame[0] = AUDIO_FRAME_OPCODE;
+          frame.set(new Uint8Array(int16Data.buffer), 1);
+          ws.send(frame);
         }
       };
 
@@ -203,6 +268,7 @@ export function useWebRTC(options: UseWebRTCOptions = {}) {
     audioQueueRef.current = [];
     isPlayingRef.current = false;
     processedItemsRef.current.clear();
+    historyIdsRef.current.clear();
     setIsConnected(false);
   }, []);
 